@@ -9,7 +9,7 @@ print(f"Source exists: {os.path.exists(src)}")
 print(f"Destination directory exists: {os.path.exists('data')}")
 
 try:
-    shutil.copy2(src, dst)
+    shutil.copyfile(src, dst)
     print(f"Successfully copied {src} to {dst}")
 except Exception as e:
     print(f"Error copying file: {e}")
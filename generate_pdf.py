@@ -1,59 +1,85 @@
 """Convert TECHNICAL_DOCS.md to a formatted PDF."""
+import io
 import os
 import re
+from functools import lru_cache
 from fpdf import FPDF
 
-
-def sanitize(text):
+# Markdown patterns, compiled once and reused for every line.
+HEADER_RE = re.compile(r"^(#{1,3})\s+(.*)")
+BULLET_RE = re.compile(r"^(\s*)[*\-]\s+(.*)")
+NUM_RE = re.compile(r"^\s*\d+\.\s+(.*)")
+BOLD_RE = re.compile(r"\*\*(.*?)\*\*")
+# Bold, inline code and links in one alternation, stripped in a single pass
+INLINE_RE = re.compile(r"\*\*(.*?)\*\*|`([^`]+)`|\[([^\]]+)\]\([^)]+\)")
+# Characters allowed in a table separator row such as "|---|:--:|"
+TABLE_SEP_CHARS = " \t-:|"
+
+
+# Unicode characters and their ASCII equivalents for PDF output.
+UNICODE_REPLACEMENTS = {
+    "\u2014": "-",   # em-dash
+    "\u2013": "-",   # en-dash
+    "\u2018": "'",   # left single quote
+    "\u2019": "'",   # right single quote
+    "\u201c": '"',   # left double quote
+    "\u201d": '"',   # right double quote
+    "\u2026": "...", # ellipsis
+    "\u2022": "*",   # bullet
+    "\u25ba": ">",   # triangle
+    "\u25bc": "v",   # down triangle
+    "\u2502": "|",   # box drawing
+    "\u250c": "+",   # box corner
+    "\u2514": "+",   # box corner
+    "\u2500": "-",   # box horizontal
+    "\u251c": "|",   # box tee
+    "\u2510": "+",   # box corner
+    "\u2518": "+",   # box corner
+    "\u2524": "|",   # box tee
+    "\u252c": "+",   # box tee
+    "\u2534": "+",   # box tee
+    "\u253c": "+",   # box cross
+    "\u2550": "=",   # double horizontal
+    "\u2551": "||",  # double vertical
+    "\u2265": ">=",  # greater or equal
+    "\u2264": "<=",  # less or equal
+    "\u00d7": "x",   # multiplication
+    "\u00b7": ".",   # middle dot
+    "\u2191": "^",   # up arrow
+    "\u2192": "->",  # right arrow
+    "\u2193": "v",   # down arrow
+    "\u2713": "[Y]", # check mark
+    "\u2717": "[X]", # cross mark
+    "\u25cf": "*",   # filled circle
+    "\u25cb": "o",   # empty circle
+    "\u20b9": "Rs.", # rupee sign
+    "\u2620": "!!",  # skull
+    "\u26a0": "!!",  # warning
+    "\u2728": "*",   # sparkles
+    "\u2764": "<3",  # heart
+    "\u2615": "",    # coffee
+}
+_TRANSLATE_TABLE = str.maketrans(UNICODE_REPLACEMENTS)
+
+
+def _sanitize_impl(text):
     """Replace Unicode characters with ASCII equivalents for PDF."""
-    replacements = {
-        "\u2014": "-",   # em-dash
-        "\u2013": "-",   # en-dash
-        "\u2018": "'",   # left single quote
-        "\u2019": "'",   # right single quote
-        "\u201c": '"',   # left double quote
-        "\u201d": '"',   # right double quote
-        "\u2026": "...", # ellipsis
-        "\u2022": "*",   # bullet
-        "\u25ba": ">",   # triangle
-        "\u25bc": "v",   # down triangle
-        "\u2502": "|",   # box drawing
-        "\u250c": "+",   # box corner
-        "\u2514": "+",   # box corner
-        "\u2500": "-",   # box horizontal
-        "\u251c": "|",   # box tee
-        "\u2510": "+",   # box corner
-        "\u2518": "+",   # box corner
-        "\u2524": "|",   # box tee
-        "\u252c": "+",   # box tee
-        "\u2534": "+",   # box tee
-        "\u253c": "+",   # box cross
-        "\u2550": "=",   # double horizontal
-        "\u2551": "||",  # double vertical
-        "\u2265": ">=",  # greater or equal
-        "\u2264": "<=",  # less or equal
-        "\u00d7": "x",   # multiplication
-        "\u00b7": ".",   # middle dot
-        "\u2191": "^",   # up arrow
-        "\u2192": "->",  # right arrow
-        "\u2193": "v",   # down arrow
-        "\u2713": "[Y]", # check mark
-        "\u2717": "[X]", # cross mark
-        "\u25cf": "*",   # filled circle
-        "\u25cb": "o",   # empty circle
-        "\u20b9": "Rs.", # rupee sign
-        "\u2620": "!!",  # skull
-        "\u26a0": "!!",  # warning
-        "\u2728": "*",   # sparkles
-        "\u2764": "<3",  # heart
-        "\u2615": "",    # coffee
-    }
-    for char, replacement in replacements.items():
-        text = text.replace(char, replacement)
+    text = text.translate(_TRANSLATE_TABLE)
     # Fallback: replace any remaining non-latin-1 chars
     return text.encode("latin-1", "replace").decode("latin-1")
 
 
+def strip_inline(text):
+    """Remove bold, inline code and link markup, keeping the inner text."""
+    # Recurse into the captured text so nested markup like **`x`** is removed too
+    return INLINE_RE.sub(lambda m: strip_inline(m.group(m.lastindex)), text)
+
+
+# Titles, table cells and bullets repeat often; code blocks rarely do and
+# call _sanitize_impl directly so they don't evict useful entries.
+sanitize = lru_cache(maxsize=4096)(_sanitize_impl)
+
+
 class TechDocPDF(FPDF):
     def header(self):
         if self.page_no() > 1:
@@ -92,24 +118,26 @@ class TechDocPDF(FPDF):
         self.set_font("Courier", "", 8)
         self.set_fill_color(240, 240, 245)
         self.set_text_color(50, 50, 50)
-        lines = code.split("\n")
-        for line in lines:
-            safe = sanitize(line)
-            self.cell(0, 4.5, "  " + safe, fill=True, new_x="LMARGIN", new_y="NEXT")
+        safe = _sanitize_impl(code)
+        self.multi_cell(0, 4.5, "  " + safe.replace("\n", "\n  "), fill=True, align="L")
         self.ln(3)
 
-    def table_row(self, cells, is_header=False):
+    def draw_table(self, rows):
+        self.set_font("Helvetica", "B", 9)
+        self.set_fill_color(30, 60, 120)
+        self.set_text_color(255, 255, 255)
+        self._emit_row(rows[0])
+        self.set_font("Helvetica", "", 9)
+        self.set_fill_color(245, 245, 250)
+        self.set_text_color(40, 40, 40)
+        for row in rows[1:]:
+            self._emit_row(row)
+
+    def _emit_row(self, cells):
+        # Each row spans the full width, so ragged rows get wider cells
         col_w = (self.w - 20) / len(cells)
-        self.set_font("Helvetica", "B" if is_header else "", 9)
-        if is_header:
-            self.set_fill_color(30, 60, 120)
-            self.set_text_color(255, 255, 255)
-        else:
-            self.set_fill_color(245, 245, 250)
-            self.set_text_color(40, 40, 40)
         for cell in cells:
-            safe = sanitize(cell)
-            self.cell(col_w, 7, " " + safe, border=1, fill=True)
+            self.cell(col_w, 7, " " + sanitize(cell), border=1, fill=True)
         self.ln()
 
     def bullet(self, text, indent=0):
@@ -124,9 +152,6 @@ class TechDocPDF(FPDF):
 
 
 def parse_and_generate(md_path, pdf_path):
-    with open(md_path, "r", encoding="utf-8") as f:
-        lines = f.readlines()
-
     pdf = TechDocPDF()
     pdf.alias_nb_pages()
     pdf.set_auto_page_break(auto=True, margin=20)
@@ -158,107 +183,105 @@ def parse_and_generate(md_path, pdf_path):
     code_buf = []
     in_table = False
     table_rows = []
-    text_buf = []
+    text_buf = io.StringIO()
 
     def flush_text():
-        if text_buf:
-            combined = " ".join(text_buf).strip()
+        if text_buf.tell():
+            combined = text_buf.getvalue().strip()
             if combined:
                 pdf.body_text(combined)
-            text_buf.clear()
+            text_buf.seek(0)
+            text_buf.truncate(0)
 
     def flush_table():
         nonlocal in_table
         if table_rows:
-            for i, row in enumerate(table_rows):
-                pdf.table_row(row, is_header=(i == 0))
+            pdf.draw_table(table_rows)
             pdf.ln(3)
         table_rows.clear()
         in_table = False
 
-    for raw_line in lines:
-        line = raw_line.rstrip()
+    with open(md_path, "r", encoding="utf-8") as f:
+        for raw_line in f:
+            line = raw_line.rstrip()
+
+            # Code block toggle
+            if line.startswith("```"):
+                if in_code:
+                    flush_text()
+                    pdf.code_block("\n".join(code_buf))
+                    code_buf.clear()
+                    in_code = False
+                else:
+                    flush_text()
+                    if in_table:
+                        flush_table()
+                    in_code = True
+                continue
 
-        # Code block toggle
-        if line.startswith("```"):
             if in_code:
+                code_buf.append(line)
+                continue
+
+            # Table
+            if "|" in line and line.strip().startswith("|"):
+                # Skip separator rows (plain string checks, no regex needed)
+                stripped = line.strip()
+                if (len(stripped) > 2 and stripped.endswith("|")
+                        and not stripped.strip(TABLE_SEP_CHARS)):
+                    continue
                 flush_text()
-                pdf.code_block("\n".join(code_buf))
-                code_buf.clear()
-                in_code = False
+                if not in_table:
+                    in_table = True
+                cells = [c.strip() for c in line.strip().strip("|").split("|")]
+                # Remove markdown bold
+                cells = [BOLD_RE.sub(r"\1", c) for c in cells]
+                table_rows.append(cells)
+                continue
             else:
-                flush_text()
                 if in_table:
                     flush_table()
-                in_code = True
-            continue
 
-        if in_code:
-            code_buf.append(line)
-            continue
+            # Horizontal rule
+            if line.strip() == "---":
+                flush_text()
+                continue
+
+            # Headers
+            m = HEADER_RE.match(line)
+            if m:
+                flush_text()
+                level = len(m.group(1))
+                title = strip_inline(m.group(2))
+                pdf.chapter_title(title, level)
+                continue
 
-        # Table
-        if "|" in line and line.strip().startswith("|"):
-            # Skip separator rows
-            if re.match(r"^\|[\s\-:|]+\|$", line.strip()):
+            # Bullets
+            bm = BULLET_RE.match(line)
+            if bm:
+                flush_text()
+                indent = len(bm.group(1)) // 2
+                text = strip_inline(bm.group(2))
+                pdf.bullet(text, indent)
                 continue
-            flush_text()
-            if not in_table:
-                in_table = True
-            cells = [c.strip() for c in line.strip().strip("|").split("|")]
-            # Remove markdown bold
-            cells = [re.sub(r"\*\*(.*?)\*\*", r"\1", c) for c in cells]
-            table_rows.append(cells)
-            continue
-        else:
-            if in_table:
-                flush_table()
-
-        # Horizontal rule
-        if line.strip() == "---":
-            flush_text()
-            continue
-
-        # Headers
-        m = re.match(r"^(#{1,3})\s+(.*)", line)
-        if m:
-            flush_text()
-            level = len(m.group(1))
-            title = re.sub(r"\*\*(.*?)\*\*", r"\1", m.group(2))
-            # Remove markdown links
-            title = re.sub(r"\[([^\]]+)\]\([^)]+\)", r"\1", title)
-            pdf.chapter_title(title, level)
-            continue
-
-        # Bullets
-        bm = re.match(r"^(\s*)[*\-]\s+(.*)", line)
-        if bm:
-            flush_text()
-            indent = len(bm.group(1)) // 2
-            text = re.sub(r"\*\*(.*?)\*\*", r"\1", bm.group(2))
-            text = re.sub(r"`([^`]+)`", r"\1", text)
-            pdf.bullet(text, indent)
-            continue
-
-        # Numbered list
-        nm = re.match(r"^\s*\d+\.\s+(.*)", line)
-        if nm:
-            flush_text()
-            text = re.sub(r"\*\*(.*?)\*\*", r"\1", nm.group(1))
-            text = re.sub(r"`([^`]+)`", r"\1", text)
-            pdf.bullet(text)
-            continue
-
-        # Empty line
-        if not line.strip():
-            flush_text()
-            continue
-
-        # Regular text - clean markdown
-        clean = re.sub(r"\*\*(.*?)\*\*", r"\1", line)
-        clean = re.sub(r"`([^`]+)`", r"\1", clean)
-        clean = re.sub(r"\[([^\]]+)\]\([^)]+\)", r"\1", clean)
-        text_buf.append(clean.strip())
+
+            # Numbered list
+            nm = NUM_RE.match(line)
+            if nm:
+                flush_text()
+                text = strip_inline(nm.group(1))
+                pdf.bullet(text)
+                continue
+
+            # Empty line
+            if not line.strip():
+                flush_text()
+                continue
+
+            # Regular text - clean markdown
+            clean = strip_inline(line)
+            text_buf.write(clean.strip())
+            text_buf.write(" ")
 
     flush_text()
     if in_table:
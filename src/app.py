@@ -1,13 +1,21 @@
 import streamlit as st
+import hashlib
 import json
+import logging
 import os
-from sentence_transformers import SentenceTransformer, util
-from model_engine import SLMEngine
-from rag_engine import RAGEngine
+import re
+
+try:
+    import orjson  # optional: faster JSON parsing
+except ImportError:
+    orjson = None
 
 # ── Resolve paths relative to project root ──────────────────────────────────
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATASET_PATH = os.path.join(PROJECT_ROOT, "bfsi_alpaca_1_to_160_final_clean.json")
+EMBED_MODEL = "all-MiniLM-L6-v2"
+
+log = logging.getLogger(__name__)
 
 # Page Config
 st.set_page_config(page_title="BFSI AI Assistant", layout="wide")
@@ -18,19 +26,84 @@ st.set_page_config(page_title="BFSI AI Assistant", layout="wide")
 def load_resources():
     st.text("Loading resources...")
 
+    # Heavy ML imports are deferred to here so only the cached cold start pays for them
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from model_engine import SLMEngine
+    from rag_engine import RAGEngine
+
     # 1. Load Dataset (PRD §3.1: 150+ Alpaca samples)
-    with open(DATASET_PATH, "r", encoding="utf-8") as f:
-        dataset = json.load(f)
+    if orjson is not None:
+        with open(DATASET_PATH, "rb") as f:
+            dataset = orjson.loads(f.read())
+    else:
+        with open(DATASET_PATH, "r", encoding="utf-8") as f:
+            dataset = json.load(f)
 
     # 2. Load Embedding Model for Similarity
-    embedder = SentenceTransformer("all-MiniLM-L6-v2")
+    embedder = SentenceTransformer(EMBED_MODEL)
+    # INT8 dynamic quantization of the Linear layers for faster CPU encoding;
+    # quantized Linear kernels are CPU-only, so GPU hosts keep the fp32 model
+    quantized = embedder.device.type == "cpu"
+    if quantized:
+        transformer = embedder._first_module()
+        transformer.auto_model = torch.quantization.quantize_dynamic(
+            transformer.auto_model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+    embedder.encode("warmup")
     match_texts = []
     for item in dataset:
         text = item["instruction"]
         if item.get("input"):
             text += " " + item["input"]
         match_texts.append(text)
-    dataset_embeddings = embedder.encode(match_texts, convert_to_tensor=True)
+    torch.set_num_threads(max(1, os.cpu_count() or 1))
+
+    # Reuse embeddings from a previous run if the texts and model are unchanged
+    cache_key = hashlib.blake2b(
+        ("\n".join(match_texts) + f"|{EMBED_MODEL}" + ("-int8" if quantized else "")).encode("utf-8")
+    ).hexdigest()[:16]
+    cache_path = os.path.join(PROJECT_ROOT, f".emb_cache_{cache_key}.pt")
+    dataset_embeddings = None
+    if os.path.exists(cache_path):
+        try:
+            dataset_embeddings = torch.load(cache_path, map_location=embedder.device).float()
+        except Exception as e:
+            # A truncated or corrupt cache is just a miss; it is rewritten below
+            log.warning("Ignoring unreadable embedding cache %s: %s", cache_path, e)
+    if dataset_embeddings is None:
+        # Encode in as few batches as possible, normalized once up front so
+        # each query is a single GEMV
+        dataset_embeddings = embedder.encode(
+            match_texts,
+            convert_to_tensor=True,
+            batch_size=min(256, len(match_texts)),
+            show_progress_bar=False,
+            normalize_embeddings=True,
+        )
+        # Write under a temp name and rename, so a killed process never
+        # leaves a partial cache behind
+        tmp_path = f"{cache_path[:-3]}.{os.getpid()}.tmp.pt"
+        try:
+            torch.save(dataset_embeddings.half().cpu(), tmp_path)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            # The cache is only an optimization; a read-only checkout still starts
+            log.warning("Could not write embedding cache %s: %s", cache_path, e)
+    # FP16 GEMV only pays off on CUDA; CPUs mostly lack fast half GEMM
+    if dataset_embeddings.device.type == "cuda":
+        dataset_embeddings = dataset_embeddings.half()
+    dataset_embeddings_T = dataset_embeddings.t().contiguous()
+
+    # Exact inner-product index when FAISS is installed (optional dependency)
+    try:
+        import faiss
+
+        emb = dataset_embeddings.cpu().numpy().astype("float32")
+        index = faiss.IndexFlatIP(emb.shape[1])
+        index.add(emb)
+    except ImportError:
+        index = None
 
     # 3. Load RAG (PRD §3.3: Knowledge retrieval)
     rag = RAGEngine(
@@ -43,11 +116,11 @@ def load_resources():
     slm = SLMEngine()
     slm.load_model()
 
-    return dataset, dataset_embeddings, embedder, rag, slm
+    return dataset, dataset_embeddings_T, index, embedder, quantized, rag, slm
 
 
 try:
-    dataset, dataset_embeddings, embedder, rag, slm = load_resources()
+    dataset, dataset_embeddings_T, index, embedder, quantized, rag, slm = load_resources()
     st.success("System Ready!")
 except Exception as e:
     st.error(f"Error loading system: {e}")
@@ -55,27 +128,50 @@ except Exception as e:
 
 
 # ── Helpers ──────────────────────────────────────────────────────────────────
+@st.cache_data(max_entries=512, show_spinner=False)
+def _match_cached(query_key):
+    """Return (top_idx, top_score, query_embedding) for a normalized query."""
+    if index is not None:
+        query_embedding = embedder.encode([query_key], normalize_embeddings=True)
+        query_embedding = query_embedding.astype("float32")
+        scores, ids = index.search(query_embedding, 1)
+        return int(ids[0, 0]), float(scores[0, 0]), query_embedding[0]
+
+    query_embedding = embedder.encode(
+        query_key, convert_to_tensor=True, normalize_embeddings=True
+    )
+    cos_scores = (query_embedding.to(dataset_embeddings_T.dtype) @ dataset_embeddings_T).float()
+    top_idx = int(cos_scores.argmax())
+    return top_idx, float(cos_scores[top_idx]), query_embedding.float().cpu().numpy()
+
+
 def get_best_match(query, threshold=0.70):
     """PRD §4 Tier 1: Dataset Match — return stored response if similarity high."""
-    query_embedding = embedder.encode(query, convert_to_tensor=True)
-    cos_scores = util.cos_sim(query_embedding, dataset_embeddings)[0]
-    top_idx = cos_scores.argmax().item()
-    top_score = cos_scores[top_idx].item()
+    # The query embedding is returned too so Tier 3 can reuse it
+    top_idx, top_score, query_embedding = _match_cached(query.strip().lower())
 
     if top_score >= threshold:
-        return dataset[top_idx]["output"], top_score
-    return None, top_score
+        return dataset[top_idx]["output"], top_score, query_embedding
+    return None, top_score, query_embedding
+
+
+COMPLEX_KEYWORDS = frozenset({
+    "policy", "breakdown", "schedule", "penalty", "detailed",
+    "clause", "terms", "grievance", "ombudsman", "redressal",
+    "billing cycle", "late payment", "cash withdrawal", "digital",
+    "limit", "cooling period",
+})
+# Single-pass multi-keyword scan; longest keywords first so the
+# alternation order is deterministic regardless of set iteration order
+_COMPLEX_RE = re.compile(
+    "|".join(map(re.escape, sorted(COMPLEX_KEYWORDS, key=lambda kw: (-len(kw), kw)))),
+    re.IGNORECASE,
+)
 
 
 def is_complex_query(query):
     """PRD §4 Tier 3: Detect queries needing RAG (policy/knowledge docs)."""
-    complex_keywords = [
-        "policy", "breakdown", "schedule", "penalty", "detailed",
-        "clause", "terms", "grievance", "ombudsman", "redressal",
-        "billing cycle", "late payment", "cash withdrawal", "digital",
-        "limit", "cooling period",
-    ]
-    return any(kw in query.lower() for kw in complex_keywords)
+    return _COMPLEX_RE.search(query) is not None
 
 
 # ── UI ───────────────────────────────────────────────────────────────────────
@@ -117,7 +213,7 @@ if prompt := st.chat_input("How can I help you today?"):
 
         # ── PRD §4: Response Logic ──────────────────────────────────────
         # Tier 1: Dataset Match
-        match_response, score = get_best_match(prompt)
+        match_response, score, query_embedding = get_best_match(prompt)
 
         if match_response:
             response = f"{match_response}\n\n*(Source: Dataset, Confidence: {score:.2f})*"
@@ -125,7 +221,11 @@ if prompt := st.chat_input("How can I help you today?"):
         # Tier 3: Complex query → RAG + SLM
         elif is_complex_query(prompt):
             response_placeholder.markdown("🔍 Searching knowledge base...")
-            contexts = rag.retrieve(prompt)
+            # The store was encoded by RAGEngine's fp32 model; only reuse the
+            # Tier 1 embedding when it came from those same unquantized weights
+            contexts = rag.retrieve(
+                prompt, query_embedding=None if quantized else query_embedding
+            )
             if contexts:
                 context_str = "\n".join(contexts)
                 augmented_prompt = (
@@ -1,6 +1,11 @@
 import json
 import os
 
+try:
+    import orjson  # optional: faster JSON serialization
+except ImportError:
+    orjson = None
+
 
 def generate_bfsi_dataset():
     dataset = []
@@ -102,19 +107,25 @@ def generate_bfsi_dataset():
         extended_dataset.append(item)  # Add original
 
         # Create variations for each original item
+        orig_instr = item["instruction"]
+        lo = orig_instr.lower()
         for var in variations:
-            new_item = item.copy()
-            if not item["instruction"].lower().startswith("how") and not item["instruction"].lower().startswith("what"):
-                new_item["instruction"] = var + item["instruction"]
+            if not lo.startswith(("how", "what")):
+                new_instr = var + orig_instr
+            elif lo.startswith("what is"):
+                new_instr = orig_instr.replace("What is", "Tell me about")
+            elif "how to" in lo:
+                new_instr = orig_instr.replace("How to", "I need to")
             else:
-                if item["instruction"].lower().startswith("what is"):
-                    new_item["instruction"] = item["instruction"].replace("What is", "Tell me about")
-                elif "how to" in item["instruction"].lower():
-                    new_item["instruction"] = item["instruction"].replace("How to", "I need to")
+                continue
 
             # Only add if instruction actually changed
-            if new_item["instruction"] != item["instruction"]:
-                extended_dataset.append(new_item)
+            if new_instr != orig_instr:
+                extended_dataset.append({
+                    "instruction": new_instr,
+                    "input": item["input"],
+                    "output": item["output"]
+                })
 
     # Cap at 180 to be safe and above 150
     final_dataset = extended_dataset[:180]
@@ -126,8 +137,13 @@ def generate_bfsi_dataset():
         os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
         "bfsi_alpaca_1_to_160_final_clean.json"
     )
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(final_dataset, f, indent=4, ensure_ascii=False)
+    # Both writers produce the same 2-space indented UTF-8 layout
+    if orjson is not None:
+        with open(output_path, "wb") as f:
+            f.write(orjson.dumps(final_dataset, option=orjson.OPT_INDENT_2))
+    else:
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump(final_dataset, f, indent=2, ensure_ascii=False)
     print(f"Dataset saved to {output_path}")
 
 
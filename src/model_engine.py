@@ -6,6 +6,14 @@ Includes safety checks, out-of-domain rejection, and compliance disclaimers
 as required by PRD Section 5.
 """
 
+import re
+from collections import Counter
+
+try:
+    import re2  # RE2 DFA engine for the boolean guardrail scans
+except ImportError:
+    re2 = None
+
 
 # ── Guardrails: Out-of-domain / unsafe query detection (PRD §5) ────────────
 UNSAFE_KEYWORDS = [
@@ -216,6 +224,101 @@ DEFAULT_RESPONSE = (
 )
 
 
+# ── Keyword tables precomputed once at import ──────────────────────────────
+_UNSAFE = tuple(UNSAFE_KEYWORDS)
+_OOD = tuple(OUT_OF_DOMAIN_KEYWORDS)
+_CATEGORY_KWS = tuple(
+    (category, tuple(data["keywords"])) for category, data in RESPONSE_TEMPLATES.items()
+)
+_KW_TO_CATS = {}
+for _category, _kws in _CATEGORY_KWS:
+    for _kw in _kws:
+        _KW_TO_CATS.setdefault(_kw, []).append(_category)
+del _category, _kws, _kw
+_FINAL_RESPONSES = {
+    category: data["response"] + SAFETY_DISCLAIMER
+    for category, data in RESPONSE_TEMPLATES.items()
+}
+
+
+# ── Single-pass keyword matching (optional pyahocorasick) ─────────────────
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+
+def _build_automaton():
+    """Build one automaton mapping each keyword to the (kind, category) hits it signals."""
+    hits = {}
+    for kw in _UNSAFE:
+        hits.setdefault(kw, []).append(("unsafe", None))
+    for kw in _OOD:
+        hits.setdefault(kw, []).append(("ood", None))
+    for category, kws in _CATEGORY_KWS:
+        for kw in kws:
+            hits.setdefault(kw, []).append(("bfsi", category))
+
+    automaton = ahocorasick.Automaton()
+    for kw, kinds in hits.items():
+        automaton.add_word(kw, (kw, tuple(kinds)))
+    automaton.make_automaton()
+    return automaton
+
+
+_AUTOMATON = _build_automaton() if ahocorasick is not None else None
+
+
+# ── Regex-union fallback (no pyahocorasick) ────────────────────────────────
+def _union(kws, engine=re):
+    """Compile keywords into one alternation, longest first."""
+    return engine.compile("|".join(re.escape(kw) for kw in sorted(kws, key=len, reverse=True)))
+
+
+_UNSAFE_RE = _union(_UNSAFE, re2 or re)
+_OOD_RE = _union(_OOD, re2 or re)
+
+# Leftmost-longest, non-overlapping, anchored at a word start: "debit card"
+# consumes its "card", and "emi" no longer fires inside "premium". Always
+# stdlib re: RE2's \b is ASCII-only and would disagree with _is_word_char.
+_BFSI_RE = re.compile(r"\b(%s)" % _union(_KW_TO_CATS).pattern)
+
+
+def _is_word_char(ch):
+    """Match what the regex word-start anchor treats as a word character."""
+    return ch.isalnum() or ch == "_"
+
+
+def _nested_credits(kw):
+    """(keyword, category) pairs one longest match earns.
+
+    A longest match also credits the shorter keywords it contains at a word
+    start, but only for categories it shares with them: "fixed deposit" still
+    counts "deposit" for fd_rd, while "premium" never counts as "emi".
+    """
+    cats = _KW_TO_CATS[kw]
+    credits = [(kw, cat) for cat in cats]
+    for other, other_cats in _KW_TO_CATS.items():
+        if other == kw:
+            continue
+        start = kw.find(other)
+        while start != -1:
+            if start == 0 or not _is_word_char(kw[start - 1]):
+                credits.extend((other, cat) for cat in other_cats if cat in cats)
+                break
+            start = kw.find(other, start + 1)
+    return tuple(credits)
+
+
+_KW_CREDITS = {kw: _nested_credits(kw) for kw in _KW_TO_CATS}
+
+
+def _tally(matched):
+    """Count distinct credited BFSI keywords per category."""
+    credits = {credit for kw in matched for credit in _KW_CREDITS[kw]}
+    return Counter(cat for _, cat in credits)
+
+
 class SLMEngine:
     """Lightweight BFSI response engine with safety guardrails."""
 
@@ -230,49 +333,88 @@ class SLMEngine:
 
     # ── Guardrails (PRD §5) ─────────────────────────────────────────────
     @staticmethod
-    def _is_unsafe(query):
-        """Detect potentially unsafe or malicious queries."""
-        q = query.lower()
-        return any(kw in q for kw in UNSAFE_KEYWORDS)
+    def _is_unsafe(q):
+        """Detect potentially unsafe or malicious queries (q is lowercased)."""
+        return _UNSAFE_RE.search(q) is not None
 
     @staticmethod
-    def _is_out_of_domain(query):
-        """Detect queries outside BFSI domain."""
-        q = query.lower()
-        # Check if it matches ANY BFSI keyword first
-        for data in RESPONSE_TEMPLATES.values():
-            if any(kw in q for kw in data["keywords"]):
-                return False  # It's BFSI-related
-        # Then check if it matches out-of-domain keywords
-        return any(kw in q for kw in OUT_OF_DOMAIN_KEYWORDS)
+    def _is_out_of_domain(q):
+        """Detect non-BFSI topics (q is lowercased and matched no BFSI keyword)."""
+        return _OOD_RE.search(q) is not None
 
-    def generate_response(self, prompt, max_new_tokens=200):
-        """Match the query against BFSI templates with safety checks."""
-        # ── Step 1: Safety Check (PRD §5) ───────────────────────────────
-        if self._is_unsafe(prompt):
-            return UNSAFE_RESPONSE
+    @staticmethod
+    def _score_categories(q):
+        """Count distinct keyword matches per category for a lowercased query."""
+        return _tally(m.group(1) for m in _BFSI_RE.finditer(q))
 
-        # ── Step 2: Out-of-domain Check (PRD §5) ────────────────────────
-        if self._is_out_of_domain(prompt):
-            return OUT_OF_DOMAIN_RESPONSE
+    @staticmethod
+    def _scan_automaton(q):
+        """Return (unsafe, out_of_domain, category_scores) in one pass over the query."""
+        out_of_domain = False
+        spans = []
+        for end, (kw, kinds) in _AUTOMATON.iter(q):
+            for kind, _ in kinds:
+                if kind == "unsafe":
+                    return True, False, {}
+                if kind == "ood":
+                    out_of_domain = True
+            if kw in _KW_TO_CATS:
+                start = end - len(kw) + 1
+                if start == 0 or not _is_word_char(q[start - 1]):
+                    spans.append((start, -len(kw), kw))
 
-        query_lower = prompt.lower()
+        # Same leftmost-longest, non-overlapping selection as _BFSI_RE
+        matched = []
+        pos = 0
+        for start, neg_len, kw in sorted(spans):
+            if start >= pos:
+                matched.append(kw)
+                pos = start - neg_len
+        return False, out_of_domain, _tally(matched)
 
-        # ── Step 3: Score each category by keyword matches ──────────────
+    def _classify(self, q):
+        """Classify a lowercased query as "unsafe", "ood", ("bfsi", category) or "default"."""
+        if _AUTOMATON is not None:
+            unsafe, out_of_domain, scores = self._scan_automaton(q)
+            if unsafe:
+                return "unsafe"
+        else:
+            if self._is_unsafe(q):
+                return "unsafe"
+            scores = self._score_categories(q)
+            out_of_domain = not scores and self._is_out_of_domain(q)
+
+        # Ties go to the first category in template order
         best_category = None
         best_score = 0
-
-        for category, data in RESPONSE_TEMPLATES.items():
-            score = sum(1 for kw in data["keywords"] if kw in query_lower)
+        for category, _ in _CATEGORY_KWS:
+            score = scores.get(category, 0)
             if score > best_score:
                 best_score = score
                 best_category = category
 
-        if best_category and best_score > 0:
-            response = RESPONSE_TEMPLATES[best_category]["response"]
-            return response + SAFETY_DISCLAIMER
+        if best_category is not None:
+            return ("bfsi", best_category)
+        return "ood" if out_of_domain else "default"
 
-        return DEFAULT_RESPONSE
+    def generate_response(self, prompt, max_new_tokens=200):
+        """Match the query against BFSI templates with safety checks."""
+        label = self._classify(prompt.lower())
+
+        # ── Step 1: Safety Check (PRD §5) ───────────────────────────────
+        if label == "unsafe":
+            return UNSAFE_RESPONSE
+
+        # ── Step 2: Out-of-domain Check (PRD §5) ────────────────────────
+        if label == "ood":
+            return OUT_OF_DOMAIN_RESPONSE
+
+        # ── Step 3: Best-scoring category by keyword matches ────────────
+        if label == "default":
+            return DEFAULT_RESPONSE
+
+        _, best_category = label
+        return _FINAL_RESPONSES[best_category]
 
 
 if __name__ == "__main__":
@@ -302,3 +444,34 @@ if __name__ == "__main__":
     print("\n" + "=" * 60)
     print("TEST 6: Card query")
     print(slm.generate_response("How do I block my lost debit card?"))
+
+    print("\n" + "=" * 60)
+    print("TEST 7: Keyword scoring (longest match at word starts)")
+    expected = {
+        "reset my password": ("bfsi", "mobile_net_banking"),  # no "rd" in "password"
+        "premium amount": ("bfsi", "insurance_policy"),  # no "emi" in "premium"
+        # "premium" (insurance_policy) and "payment" (transaction) tie 1-1 and
+        # template order picks transaction; before, "emi" inside "premium" won
+        "Is premium payment due?": ("bfsi", "transaction"),
+        "fd maturity": ("bfsi", "fd_rd"),
+        "How do I block my lost debit card?": ("bfsi", "card"),
+        # Same-category nested keywords still count ("fixed deposit" + "deposit")
+        "What is the fixed deposit interest rate?": ("bfsi", "fd_rd"),
+        "recurring deposit interest rate": ("bfsi", "fd_rd"),
+        "credit card interest rate": ("bfsi", "card"),
+    }
+    for query, label in expected.items():
+        got = slm._classify(query.lower())
+        assert got == label, (query, got, label)
+
+    if _AUTOMATON is not None:
+        # The pyahocorasick and regex paths must agree, non-ASCII text included
+        words = sorted(set(_KW_TO_CATS) | set(_UNSAFE) | set(_OOD))
+        queries = [f"{a}{sep}{b}" for a in words for b in words for sep in (" ", "é", "-")]
+        for q in queries:
+            unsafe, _, scores = slm._scan_automaton(q)
+            assert unsafe == slm._is_unsafe(q), q
+            if not unsafe:
+                assert scores == slm._score_categories(q), q
+        print(f"Automaton and regex scoring agree on {len(queries)} queries.")
+    print("OK")
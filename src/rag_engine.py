@@ -5,19 +5,106 @@ Replaces ChromaDB (broken on Python 3.14) with a simple pickle-based
 vector store that has zero pydantic dependency.
 """
 
+import glob
+import hashlib
+import logging
 import os
 import pickle
+from functools import lru_cache
 import numpy as np
+import torch
 from sentence_transformers import SentenceTransformer
 
+log = logging.getLogger(__name__)
+
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+
+# ── Optional JIT top-k kernel ───────────────────────────────────────────
+if njit is not None:
+
+    # No "ninf"/"nnan" fast-math flags, and a finite sentinel below any
+    # unit-vector dot product (-1) instead of -inf for the empty slots
+    @njit(parallel=True, fastmath={"contract", "reassoc", "arcp"}, cache=True)
+    def _topk_cosine(E, q, k):
+        """Top-k dot products of unit rows E against q, without a full score array (k >= 1)."""
+        n, d = E.shape
+        n_blocks = min(n, 64)
+        blk_val = np.full((n_blocks, k), -2.0, dtype=np.float32)
+        blk_idx = np.full((n_blocks, k), -1, dtype=np.int64)
+
+        # Each block streams its rows and keeps a sorted local top-k
+        for b in prange(n_blocks):
+            for i in range(b * n // n_blocks, (b + 1) * n // n_blocks):
+                s = np.float32(0.0)
+                for j in range(d):
+                    s += E[i, j] * q[j]
+                if s > blk_val[b, k - 1]:
+                    pos = k - 1
+                    while pos > 0 and blk_val[b, pos - 1] < s:
+                        blk_val[b, pos] = blk_val[b, pos - 1]
+                        blk_idx[b, pos] = blk_idx[b, pos - 1]
+                        pos -= 1
+                    blk_val[b, pos] = s
+                    blk_idx[b, pos] = i
+
+        # Merge the per-block results
+        top_val = np.full(k, -2.0, dtype=np.float32)
+        top_idx = np.full(k, -1, dtype=np.int64)
+        for b in range(n_blocks):
+            for r in range(k):
+                s = blk_val[b, r]
+                if blk_idx[b, r] < 0 or s <= top_val[k - 1]:
+                    break  # block lists are sorted, the rest can't qualify
+                pos = k - 1
+                while pos > 0 and top_val[pos - 1] < s:
+                    top_val[pos] = top_val[pos - 1]
+                    top_idx[pos] = top_idx[pos - 1]
+                    pos -= 1
+                top_val[pos] = s
+                top_idx[pos] = blk_idx[b, r]
+        return top_idx, top_val
+
+else:
+    _topk_cosine = None
+
+
+def _write_atomic(path, write):
+    """Write a file under a temp name and rename it into place."""
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        write(f)
+    os.replace(tmp, path)
+
 
 class RAGEngine:
     def __init__(self, data_dir="data", db_path="vector_store.pkl"):
         self.data_dir = data_dir
         self.db_path = db_path
-        self.embedder = SentenceTransformer("all-MiniLM-L6-v2")
+        # Embedding matrix sits next to the pickle so it can be memory-mapped;
+        # the file name is keyed on the chunks and recorded in the pickle
+        self.emb_path = None
+        self._device = "cuda" if torch.cuda.is_available() else "cpu"
+        self._embedder = None  # loaded on first use, see the embedder property
         self.chunks = []
         self.embeddings = None
+        # Per-instance LRU so repeated prompts skip the transformer forward pass
+        self._embed_query = lru_cache(maxsize=1024)(self._encode_query)
+
+    @property
+    def embedder(self):
+        """SentenceTransformer model, created the first time it is needed."""
+        if self._embedder is None:
+            self._embedder = SentenceTransformer("all-MiniLM-L6-v2", device=self._device)
+        return self._embedder
 
     # ── Document Loading ────────────────────────────────────────────────
     def _load_text_file(self, file_path):
@@ -25,40 +112,40 @@ class RAGEngine:
             return f.read()
 
     def _load_pdf_file(self, file_path):
-        try:
-            from pypdf import PdfReader
-
-            reader = PdfReader(file_path)
-            text = ""
-            for page in reader.pages:
-                text += page.extract_text() or ""
-            return text
-        except ImportError:
-            print("pypdf not installed — skipping PDF files.")
+        if PdfReader is None:
+            log.warning("pypdf not installed — skipping PDF files.")
             return ""
 
+        reader = PdfReader(file_path)
+        parts = []
+        for page in reader.pages:
+            parts.append(page.extract_text() or "")
+        return "".join(parts)
+
     def load_documents(self):
         """Load all .txt and .pdf files from data_dir."""
         all_text = []
         if not os.path.exists(self.data_dir):
-            print(f"Data directory '{self.data_dir}' not found.")
+            log.warning("Data directory '%s' not found.", self.data_dir)
             return all_text
 
-        for filename in os.listdir(self.data_dir):
-            file_path = os.path.join(self.data_dir, filename)
-            try:
-                if filename.endswith(".txt"):
-                    text = self._load_text_file(file_path)
-                    if text.strip():
-                        all_text.append(text)
-                        print(f"  Loaded: {filename}")
-                elif filename.endswith(".pdf"):
-                    text = self._load_pdf_file(file_path)
+        with os.scandir(self.data_dir) as entries:
+            for entry in entries:
+                filename = entry.name
+                ext = os.path.splitext(filename)[1].lower()
+                if ext not in (".txt", ".pdf") or not entry.is_file():
+                    continue
+                try:
+                    if ext == ".txt":
+                        text = self._load_text_file(entry.path)
+                    else:
+                        text = self._load_pdf_file(entry.path)
                     if text.strip():
                         all_text.append(text)
-                        print(f"  Loaded: {filename}")
-            except Exception as e:
-                print(f"  Error loading {filename}: {e}")
+                        if log.isEnabledFor(logging.DEBUG):
+                            log.debug("  Loaded: %s", filename)
+                except Exception as e:
+                    log.warning("  Error loading %s: %s", filename, e)
 
         return all_text
 
@@ -67,22 +154,28 @@ class RAGEngine:
     def _split_text(text, chunk_size=400, overlap=80):
         """Split text into overlapping chunks."""
         chunks = []
-        start = 0
-        while start < len(text):
-            end = start + chunk_size
-            chunk = text[start:end].strip()
-            if chunk:
-                chunks.append(chunk)
-            start += chunk_size - overlap
+        n = len(text)
+        for start in range(0, n, chunk_size - overlap):
+            end = min(start + chunk_size, n)
+            # Trim whitespace by moving the bounds so each chunk is sliced once
+            s, e = start, end
+            while s < e and text[s].isspace():
+                s += 1
+            while e > s and text[e - 1].isspace():
+                e -= 1
+            if e > s:
+                chunks.append(text[s:e])
+            if end == n:
+                break  # later windows would only repeat the tail
         return chunks
 
     # ── Vector Store ────────────────────────────────────────────────────
     def create_vector_store(self):
         """Build embeddings from documents and save to disk."""
-        print("Loading documents...")
+        log.info("Loading documents...")
         documents = self.load_documents()
         if not documents:
-            print("No documents found. Vector store not created.")
+            log.warning("No documents found. Vector store not created.")
             return
 
         # Split into chunks
@@ -90,14 +183,59 @@ class RAGEngine:
         for doc in documents:
             self.chunks.extend(self._split_text(doc))
 
-        print(f"Splitting into {len(self.chunks)} chunks...")
-        print("Creating embeddings (this may take a moment)...")
-        self.embeddings = self.embedder.encode(self.chunks, convert_to_numpy=True)
+        log.info("Splitting into %d chunks...", len(self.chunks))
+        log.info("Creating embeddings (this may take a moment)...")
+        # Unit-length rows make retrieval a single dot product per chunk
+        self.embeddings = self.embedder.encode(
+            self.chunks,
+            batch_size=64,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=True,
+            device=self._device,
+        )
+        self.embeddings = np.ascontiguousarray(self.embeddings, dtype=np.float32)
+
+        # Save to disk: chunks in a small pickle, embeddings as a float32 .npy
+        # that load_vector_store memory-maps and BLAS reads in place. The .npy
+        # is named after the chunks and written first, so a crash between the
+        # two writes leaves the old pickle pointing at its own, complete matrix.
+        key = hashlib.blake2b("\0".join(self.chunks).encode("utf-8"), digest_size=8).hexdigest()
+        stem = os.path.splitext(self.db_path)[0]
+        self.emb_path = f"{stem}.{key}.npy"
+        _write_atomic(self.emb_path, lambda f: np.save(f, self.embeddings))
+        _write_atomic(self.db_path, lambda f: pickle.dump({
+            "chunks": self.chunks,
+            "emb_file": os.path.basename(self.emb_path),
+            "normalized": True,
+        }, f))
+        for old in glob.glob(glob.escape(stem) + ".*.npy"):
+            if old != self.emb_path:
+                try:
+                    os.remove(old)
+                except OSError:
+                    pass
+        log.info("Vector store saved to %s (+ %s)", self.db_path, self.emb_path)
 
-        # Save to disk
-        with open(self.db_path, "wb") as f:
-            pickle.dump({"chunks": self.chunks, "embeddings": self.embeddings}, f)
-        print(f"Vector store saved to {self.db_path}")
+    def _load_emb_file(self, emb_file):
+        """Memory-map the store's .npy, or return None if it is missing or stale."""
+        if not emb_file:
+            log.warning("Vector store %s has no embedding file recorded.", self.db_path)
+            return None
+        self.emb_path = os.path.join(os.path.dirname(self.db_path), emb_file)
+        try:
+            # Paged in on demand and shared between worker processes
+            embeddings = np.load(self.emb_path, mmap_mode="r")
+        except (OSError, ValueError) as e:
+            log.warning("Could not load embeddings %s: %s", self.emb_path, e)
+            return None
+        if embeddings.ndim != 2 or len(embeddings) != len(self.chunks):
+            log.warning(
+                "Embeddings %s have shape %s for %d chunks.",
+                self.emb_path, embeddings.shape, len(self.chunks),
+            )
+            return None
+        return embeddings
 
     def load_vector_store(self):
         """Load existing vector store, or create one if missing."""
@@ -105,33 +243,69 @@ class RAGEngine:
             with open(self.db_path, "rb") as f:
                 data = pickle.load(f)
             self.chunks = data["chunks"]
-            self.embeddings = data["embeddings"]
-            print(f"Loaded vector store ({len(self.chunks)} chunks).")
+            if "embeddings" not in data:
+                self.embeddings = self._load_emb_file(data.get("emb_file"))
+                if self.embeddings is None:
+                    log.info("Rebuilding the vector store...")
+                    self.create_vector_store()
+                    return
+            else:
+                # Older single-file stores keep the matrix inside the pickle
+                self.embeddings = np.ascontiguousarray(data["embeddings"], dtype=np.float32)
+                if not data.get("normalized"):
+                    # Written before normalization was added: fix up once here
+                    norms = np.linalg.norm(self.embeddings, axis=1, keepdims=True)
+                    self.embeddings /= norms + 1e-10
+            log.info("Loaded vector store (%d chunks).", len(self.chunks))
         else:
-            print("No vector store found — creating one...")
+            log.info("No vector store found — creating one...")
             self.create_vector_store()
 
     # ── Retrieval ───────────────────────────────────────────────────────
-    def retrieve(self, query, k=2):
-        """Find the k most relevant chunks for a query."""
+    def _encode_query(self, query):
+        """Embed a query as a read-only, unit-length float32 vector."""
+        emb = self.embedder.encode(
+            [query], convert_to_numpy=True, normalize_embeddings=True
+        )[0].astype(np.float32)
+        emb.setflags(write=False)  # shared across cache hits
+        return emb
+
+    def retrieve(self, query, k=2, query_embedding=None):
+        """Find the k most relevant chunks for a query (or its normalized embedding)."""
+        if k <= 0:
+            return []
         if self.embeddings is None or len(self.chunks) == 0:
             self.load_vector_store()
 
         if self.embeddings is None or len(self.chunks) == 0:
             return []
 
-        query_emb = self.embedder.encode([query], convert_to_numpy=True)
+        if query_embedding is None:
+            query_emb = self._embed_query(query)
+        else:
+            query_emb = np.asarray(query_embedding, dtype=np.float32).ravel()
 
-        # Cosine similarity
-        scores = np.dot(self.embeddings, query_emb.T).flatten()
-        norms = np.linalg.norm(self.embeddings, axis=1) * np.linalg.norm(query_emb)
-        scores = scores / (norms + 1e-10)
+        # Single fused pass when numba is installed (optional dependency)
+        if _topk_cosine is not None:
+            top_indices, top_scores = _topk_cosine(
+                self.embeddings, query_emb, min(k, len(self.chunks))
+            )
+            return [self.chunks[i] for i, s in zip(top_indices, top_scores) if s > 0.2]
 
-        top_indices = scores.argsort()[-k:][::-1]
+        # Cosine similarity (stored rows and query are already unit length)
+        scores = self.embeddings @ query_emb
+
+        # Partial selection of the k best (O(N)), then sort just those k
+        if k < scores.size:
+            top_indices = np.argpartition(-scores, k - 1)[:k]
+            top_indices = top_indices[np.argsort(-scores[top_indices])]
+        else:
+            top_indices = np.argsort(-scores)
         return [self.chunks[i] for i in top_indices if scores[i] > 0.2]
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG, format="%(message)s")
     rag = RAGEngine()
     rag.create_vector_store()
 
@@ -4,9 +4,13 @@ Fine-tuning script for BFSI SLM using LoRA (Parameter-Efficient Fine-Tuning).
 NOTE: This script requires a GPU with CUDA support and additional packages:
     pip install torch transformers peft datasets accelerate
 
+With bitsandbytes installed as well, the base model is loaded in 4-bit
+(QLoRA) and optimizer states are kept in 8-bit.
+
 This is OPTIONAL — the template-based SLMEngine works without fine-tuning.
 """
 
+import importlib.util
 import os
 
 def train():
@@ -15,7 +19,13 @@ def train():
         import torch
         from datasets import load_dataset
         from peft import LoraConfig, get_peft_model, TaskType
-        from transformers import AutoModelForCausalLM, AutoTokenizer, TrainingArguments, Trainer
+        from transformers import (
+            AutoModelForCausalLM,
+            AutoTokenizer,
+            DataCollatorForLanguageModeling,
+            TrainingArguments,
+            Trainer,
+        )
     except ImportError as e:
         print(f"Missing dependency: {e}")
         print("Install training dependencies: pip install torch transformers peft datasets accelerate")
@@ -43,18 +53,58 @@ def train():
     tokenizer = AutoTokenizer.from_pretrained(model_name)
     tokenizer.pad_token = tokenizer.eos_token
 
-    def tokenize_function(examples):
-        text = f"{examples['instruction']} {examples['input']} Answer: {examples['output']}"
-        return tokenizer(text, truncation=True, padding="max_length", max_length=256)
+    def tokenize_function(batch):
+        texts = [
+            f"{instruction} {inp} Answer: {output}"
+            for instruction, inp, output in zip(batch["instruction"], batch["input"], batch["output"])
+        ]
+        # No padding here: the collator pads each batch to its own longest example
+        return tokenizer(texts, truncation=True, max_length=256)
+
+    # Batched fast-tokenizer calls, spread over half the available cores
+    tokenized_datasets = dataset.map(
+        tokenize_function,
+        batched=True,
+        batch_size=128,
+        num_proc=max(1, (os.cpu_count() or 1) // 2),
+        remove_columns=dataset.column_names,
+    )
 
-    tokenized_datasets = dataset.map(tokenize_function)
+    # Mixed precision on GPU: bf16 where supported, fp16 otherwise
+    use_cuda = torch.cuda.is_available()
+    use_bf16 = use_cuda and torch.cuda.is_bf16_supported()
+    # bitsandbytes (GPU only) enables 4-bit base weights and 8-bit optimizer states
+    use_bnb = use_cuda and importlib.util.find_spec("bitsandbytes") is not None
 
     # Load Model
     print(f"Loading model: {model_name}")
-    model = AutoModelForCausalLM.from_pretrained(
-        model_name,
-        device_map="auto" if torch.cuda.is_available() else "cpu",
-    )
+    if use_bnb:
+        # QLoRA: frozen base weights in 4-bit NF4, compute in half precision
+        from peft import prepare_model_for_kbit_training
+        from transformers import BitsAndBytesConfig
+
+        bnb_config = BitsAndBytesConfig(
+            load_in_4bit=True,
+            bnb_4bit_quant_type="nf4",
+            bnb_4bit_compute_dtype=torch.bfloat16 if use_bf16 else torch.float16,
+            bnb_4bit_use_double_quant=True,
+        )
+        model = AutoModelForCausalLM.from_pretrained(
+            model_name,
+            quantization_config=bnb_config,
+            device_map="auto",
+        )
+        model = prepare_model_for_kbit_training(model, use_gradient_checkpointing=False)
+    else:
+        model = AutoModelForCausalLM.from_pretrained(
+            model_name,
+            torch_dtype=torch.bfloat16 if use_bf16 else torch.float32,
+            device_map="auto" if use_cuda else "cpu",
+        )
+
+    # The KV cache is useless in training and conflicts with gradient checkpointing,
+    # which Trainer enables (non-reentrant) from the TrainingArguments below
+    model.config.use_cache = False
 
     # LoRA Config (Parameter-Efficient Fine-Tuning)
     peft_config = LoraConfig(
@@ -63,6 +113,7 @@ def train():
         r=8,
         lora_alpha=32,
         lora_dropout=0.1,
+        target_modules=["q_proj", "k_proj", "v_proj", "o_proj"],
     )
     model = get_peft_model(model, peft_config)
     model.print_trainable_parameters()
@@ -77,12 +128,21 @@ def train():
         logging_dir=log_dir,
         save_strategy="epoch",
         logging_steps=10,
+        bf16=use_bf16,
+        fp16=use_cuda and not use_bf16,
+        gradient_checkpointing=True,
+        gradient_checkpointing_kwargs={"use_reentrant": False},
+        optim="paged_adamw_8bit" if use_bnb else "adamw_torch",
+        dataloader_num_workers=2,
     )
 
     trainer = Trainer(
         model=model,
         args=training_args,
         train_dataset=tokenized_datasets,
+        data_collator=DataCollatorForLanguageModeling(
+            tokenizer, mlm=False, pad_to_multiple_of=8
+        ),
     )
 
     trainer.train()